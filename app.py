@@ -1,7 +1,10 @@
 import streamlit as st
 import os
-from src.rag.retriever import Retriever
-from src.rag.reranker import ReRanker
+import time
+import uuid
+from src.rag.loader import ComponentLoader
+from src.rag.extractive import ExtractiveAnswerer
+from src.rag.session import SessionManager
 from src.rag.llm_service import LLMService
 from src.rag.metadata_filter_generator import MetadataFilterGenerator
 
@@ -150,16 +153,28 @@ def inject_custom_css():
 """, unsafe_allow_html=True)
 
 @st.cache_resource
-def load_components(api_key):
-    retriever = Retriever()
-    reranker = ReRanker()
+def get_component_loader():
+    return ComponentLoader()
+
+@st.cache_resource
+def get_session_manager(_retriever, _reranker):
+    return SessionManager(_retriever, _reranker)
+
+@st.cache_resource
+def get_extractive_answerer(_reranker):
+    return ExtractiveAnswerer(_reranker)
+
+@st.cache_resource
+def load_llm_components(api_key):
     llm_service = LLMService(api_key=api_key)
     filter_generator = MetadataFilterGenerator(api_key=api_key)
-    return retriever, reranker, llm_service, filter_generator
+    return llm_service, filter_generator
 
 def display_chat_history():
     if "messages" not in st.session_state:
         st.session_state.messages = []
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
 
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
@@ -180,7 +195,8 @@ def display_chat_history():
             else:
                 st.markdown(message["content"])
 
-def process_query(prompt, retriever, reranker, llm_service, filter_generator):
+def process_query(prompt, session_manager, llm_service, filter_generator, extractive_answerer=None):
+    session_id = st.session_state.session_id
     st.session_state.messages.append({"role": "user", "content": prompt})
     with st.chat_message("user"):
         st.markdown(prompt)
@@ -191,11 +207,13 @@ def process_query(prompt, retriever, reranker, llm_service, filter_generator):
         with st.status("Processing request...", expanded=True) as status:
             st.write("Standard Dense Retrieval...")
             metadata_filter = None
-            initial_results = retriever.search_semantic(
+            search = session_manager.search(
+                session_id,
                 prompt,
                 top_k=10,
                 metadata_filter=None
             )
+            initial_results = search["results"]
             if not initial_results:
                 st.write("No results found. analyzing query for metadata filters...")
                 metadata_filter = filter_generator.generate_filter(prompt)
@@ -205,27 +223,41 @@ def process_query(prompt, retriever, reranker, llm_service, filter_generator):
                     st.write(f"Filter applied: {filter_explanation}")
                     
                     st.write("Retrying with Metadata Filtering...")
-                    initial_results = retriever.search_semantic(
-                        prompt, 
+                    search = session_manager.search(
+                        session_id,
+                        prompt,
                         top_k=10,
                         metadata_filter=metadata_filter
                     )
+                    initial_results = search["results"]
                 else:
                     st.write("No applicable metadata filters found.")
                 
+            if search["reused"]:
+                st.write("Reusing candidates from the previous turn")
+            elif search["follow_up"]:
+                st.write("Follow-up detected, expanding with conversation context")
             st.write(f"Retrieved {len(initial_results)} candidates")
             
             st.write("Re-ranking candidates...")
-            ranked_results = reranker.rerank(prompt, initial_results, top_k=3)
+            ranked_results = session_manager.rerank(
+                session_id,
+                search,
+                top_k=3
+            )
             st.write(f"Selected top {len(ranked_results)} matches")
             
             st.write("Generating answer...")
             
             status.update(label="Complete!", state="complete", expanded=False)
 
-        context_chunks = [res['chunk'] for res in ranked_results]
+        context_chunks = session_manager.retriever.get_context_chunks(ranked_results)
         
-        response_data = llm_service.generate_response(prompt, context_chunks)
+        response_data = llm_service.generate_response(
+            prompt,
+            context_chunks,
+            extractive_answerer=extractive_answerer
+        )
         generated_answer = response_data["answer"]
         sources_text = response_data["sources"]
 
@@ -244,6 +276,9 @@ def process_query(prompt, retriever, reranker, llm_service, filter_generator):
         st.markdown("### Answer")
         st.markdown(generated_answer)
         
+        if response_data.get("mode") == "extractive":
+            st.caption(f"Answered locally from the sources (confidence {response_data['confidence']:.0%})")
+
         if metadata_filter:
             st.markdown("---")
             st.markdown(f"**Applied Filters:** {filter_generator.explain_filter(metadata_filter)}")
@@ -258,6 +293,7 @@ def process_query(prompt, retriever, reranker, llm_service, filter_generator):
 def main():
     configure_page()
     inject_custom_css()
+    loader = get_component_loader()
     
     st.sidebar.title("Configuration")
     api_key = st.sidebar.text_input("Groq API Key", type="password", help="Enter your Groq API Key here")
@@ -273,16 +309,30 @@ This service uses advanced **RAG (Retriever -> Re-Ranker -> Generator)** archite
         return
 
     try:
-        with st.spinner("Loading AI components..."):
-            retriever, reranker, llm_service, filter_generator = load_components(api_key)
+        llm_service, filter_generator = load_llm_components(api_key)
     except Exception as e:
         st.error(f"Critical error during loading: {str(e)}")
         st.stop()
 
     display_chat_history()
 
+    if loader.state == ComponentLoader.FAILED:
+        st.error(f"Critical error during loading: {str(loader.error)}")
+        if st.button("Retry loading"):
+            get_component_loader.clear()
+            st.rerun()
+        st.stop()
+
+    if not loader.is_ready:
+        st.info(f"Loading AI components: {loader.stage} Chat will be available shortly.")
+        st.chat_input("Search index is still loading...", disabled=True)
+        time.sleep(1)
+        st.rerun()
+
     if prompt := st.chat_input("What would you like to know?"):
-        process_query(prompt, retriever, reranker, llm_service, filter_generator)
+        session_manager = get_session_manager(loader.retriever, loader.reranker)
+        extractive_answerer = get_extractive_answerer(loader.reranker)
+        process_query(prompt, session_manager, llm_service, filter_generator, extractive_answerer)
 
 if __name__ == "__main__":
     main()
@@ -6,3 +6,14 @@ EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
 RERANKER_MODEL_NAME = 'cross-encoder/ms-marco-MiniLM-L-6-v2'
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 200
+EXTRACTIVE_CONFIDENCE_THRESHOLD = 0.9
+USE_HIERARCHICAL_SEARCH = True
+HIERARCHY_TOP_GROUPS = 5
+HIERARCHY_TOP_DOCUMENTS = 2
+ENRICHMENT_CACHE_PATH = "enrichment_cache.jsonl"
+ENRICHMENT_BATCH_SIZE = 20
+ENRICHMENT_MAX_WORKERS = 8
+ENRICHMENT_REQUESTS_PER_MINUTE = 30
+BATCH_QA_BATCH_SIZE = 64
+BATCH_QA_MAX_WORKERS = 8
+BATCH_QA_REQUESTS_PER_MINUTE = 30
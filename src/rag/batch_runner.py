@@ -0,0 +1,209 @@
+"""
+Batch Question Answering
+Answers a JSONL file of questions offline and writes answers to JSONL as it goes
+
+Usage:
+    python -m src.rag.batch_runner questions.jsonl answers.jsonl
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Set
+
+import config
+from src.rag.extractive import ExtractiveAnswerer
+
+ID_FIELDS = ("id", "request_id", "question_id")
+QUESTION_FIELDS = ("question", "query", "text", "body")
+
+
+class BatchRunner:
+    """
+    Runs retrieval and re-ranking for a whole batch of questions at once (one
+    encoder call and one cross-encoder call per batch), then answers them in a
+    worker pool while the next batch is being retrieved. With extractive mode on,
+    each worker first makes one more cross-encoder call to score the question's
+    sentences; questions it answers never reach the LLM, and the rest are
+    throttled by the LLMService's rate limiter.
+
+    The output file is the checkpoint: every answer is appended and flushed as
+    soon as it completes, and a restarted run skips ids already present. Answers
+    that only exist because the LLM call failed are retried with backoff and, if
+    they still fail, left out of the file so a resumed run asks them again.
+    """
+
+    def __init__(self, retriever, reranker, llm_service,
+                 batch_size=config.BATCH_QA_BATCH_SIZE,
+                 max_workers=config.BATCH_QA_MAX_WORKERS,
+                 retrieve_top_k=10, rerank_top_k=3, use_extractive=True, max_retries=3):
+        self.retriever = retriever
+        self.reranker = reranker
+        self.llm_service = llm_service
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.retrieve_top_k = retrieve_top_k
+        self.rerank_top_k = rerank_top_k
+        self.max_retries = max_retries
+        self.extractive_answerer = ExtractiveAnswerer(reranker) if use_extractive else None
+
+    @staticmethod
+    def load_questions(input_path) -> List[Dict]:
+        questions = []
+        with open(input_path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                question_id = next((record[k] for k in ID_FIELDS if k in record), line_number)
+                question = next((record[k] for k in QUESTION_FIELDS if record.get(k)), None)
+                if question is None:
+                    print(f"Warning: No question found on line {line_number}, skipping.")
+                    continue
+                questions.append({"id": str(question_id), "question": question})
+        return questions
+
+    @staticmethod
+    def load_completed(output_path) -> Set[str]:
+        """Returns ids already answered, dropping a trailing partial line left by a crash."""
+        if not os.path.exists(output_path):
+            return set()
+
+        with open(output_path, 'rb') as f:
+            data = f.read()
+        complete = data[:data.rfind(b'\n') + 1]
+        if len(complete) != len(data):
+            with open(output_path, 'wb') as f:
+                f.write(complete)
+
+        completed = set()
+        for line in complete.decode('utf-8').splitlines():
+            if line.strip():
+                completed.add(str(json.loads(line)["id"]))
+        return completed
+
+    def run(self, input_path, output_path):
+        questions = self.load_questions(input_path)
+        completed = self.load_completed(output_path)
+        todo = [q for q in questions if q["id"] not in completed]
+        print(f"{len(questions)} questions, {len(questions) - len(todo)} already answered, {len(todo)} to go.")
+
+        max_pending = self.max_workers * 4
+        answered = 0
+        with open(output_path, 'a', encoding='utf-8') as out, \
+                ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = set()
+            for start in range(0, len(todo), self.batch_size):
+                for item in self._retrieve_batch(todo[start:start + self.batch_size]):
+                    pending.add(executor.submit(self._answer, item))
+
+                while len(pending) > max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    answered += self._write(out, done)
+                print(f"Retrieved {min(start + self.batch_size, len(todo))}/{len(todo)}, answered {answered}")
+
+            done, _ = wait(pending)
+            answered += self._write(out, done)
+
+        print(f"Done. Answered {answered} questions.")
+
+    def _retrieve_batch(self, batch: List[Dict]) -> List[Dict]:
+        queries = [item["question"] for item in batch]
+
+        start = time.perf_counter()
+        query_vectors = self.retriever.encode_queries(queries)
+        results_lists = self.retriever.search_many(query_vectors, top_k=self.retrieve_top_k)
+        retrieval_ms = (time.perf_counter() - start) * 1000 / len(batch)
+
+        start = time.perf_counter()
+        ranked_lists = self.reranker.rerank_batch(queries, results_lists, top_k=self.rerank_top_k)
+        rerank_ms = (time.perf_counter() - start) * 1000 / len(batch)
+
+        return [
+            {
+                **item,
+                "ranked": ranked,
+                "timings": {"retrieval_ms": round(retrieval_ms, 2), "rerank_ms": round(rerank_ms, 2)}
+            }
+            for item, ranked in zip(batch, ranked_lists)
+        ]
+
+    def _answer(self, item: Dict) -> Dict:
+        context_chunks = self.retriever.get_context_chunks(item["ranked"])
+
+        start = time.perf_counter()
+        response_data = None
+        if self.extractive_answerer:
+            response_data = self.extractive_answerer.answer(item["question"], context_chunks)
+            if response_data:
+                response_data["mode"] = "extractive"
+        generation_ms = (time.perf_counter() - start) * 1000
+
+        # Only the LLM call is retried; the extractive scoring above runs once.
+        attempt = 0
+        while response_data is None:
+            start = time.perf_counter()
+            response_data = self.llm_service.generate_response(item["question"], context_chunks)
+            generation_ms = (time.perf_counter() - start) * 1000
+            if response_data.get("error"):
+                attempt += 1
+                if attempt >= self.max_retries:
+                    raise RuntimeError(f"LLM unavailable for question {item['id']}: {response_data['error']}")
+                time.sleep(2 ** (attempt - 1))
+                response_data = None
+
+        return {
+            "id": item["id"],
+            "question": item["question"],
+            "answer": response_data["answer"],
+            "sources": response_data["sources"],
+            "mode": response_data.get("mode"),
+            "source_ids": [res["id"] for res in item["ranked"]],
+            "timings": {**item["timings"], "generation_ms": round(generation_ms, 2)}
+        }
+
+    @staticmethod
+    def _write(out, futures) -> int:
+        written = 0
+        for future in futures:
+            try:
+                record = future.result()
+            except Exception as e:
+                print(f"Warning: Question failed, it will be retried on the next run: {e}")
+                continue
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            written += 1
+        out.flush()
+        return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions with the RAG pipeline.")
+    parser.add_argument("input_path", help="JSONL file with one question per line")
+    parser.add_argument("output_path", help="JSONL file to append answers to (also the resume checkpoint)")
+    parser.add_argument("--batch-size", type=int, default=config.BATCH_QA_BATCH_SIZE)
+    parser.add_argument("--max-workers", type=int, default=config.BATCH_QA_MAX_WORKERS)
+    parser.add_argument("--requests-per-minute", type=int, default=config.BATCH_QA_REQUESTS_PER_MINUTE)
+    parser.add_argument("--no-extractive", action="store_true", help="Send every question to the LLM")
+    args = parser.parse_args()
+
+    from src.rag.retriever import Retriever
+    from src.rag.reranker import ReRanker
+    from src.rag.llm_service import LLMService
+    from src.rag.rate_limiter import RateLimiter
+
+    runner = BatchRunner(
+        Retriever(),
+        ReRanker(),
+        LLMService(rate_limiter=RateLimiter(args.requests_per_minute)),
+        batch_size=args.batch_size,
+        max_workers=args.max_workers,
+        use_extractive=not args.no_extractive
+    )
+    runner.run(args.input_path, args.output_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Extractive Answerer
+Answers short factual questions from the retrieved chunks without calling the LLM
+"""
+
+import math
+import re
+from typing import Dict, List, Optional
+
+import config
+
+SYNTHESIS_MARKERS = (
+    "compare", "comparison", "difference", "differ", "versus", " vs ", "why",
+    "explain", "summar", "relationship", "list all", "how does", "how do",
+    "pros and cons", "advantages", "overview",
+)
+
+ARTICLE_PATTERN = re.compile(r"\barticle\s+(\d+)\b", re.IGNORECASE)
+
+# "What is Article 24 about?", "What does Article 24 say?", "Tell me about Article 24", "Article 24?"
+ARTICLE_OVERVIEW_PATTERN = re.compile(
+    r"^\s*(?:(?:what\s+is|what's)\s+(?:in\s+)?article\s+\d+(?:\s+about)?"
+    r"|what\s+does\s+article\s+\d+\s+(?:say|state|cover|provide)"
+    r"|tell\s+me\s+about\s+article\s+\d+"
+    r"|article\s+\d+)\s*[?.!]*\s*$",
+    re.IGNORECASE
+)
+
+
+class ExtractiveAnswerer:
+    """
+    Scores every sentence of the re-ranked chunks against the query with the
+    already-loaded cross-encoder and returns the best sentence with a citation
+    when its relevance probability clears the threshold. Plain "what is Article
+    N about" questions return the opening of that article; other questions that
+    name an article are scored against that article's sentences only and still
+    have to clear the threshold. Synthesis questions (compare, explain,
+    summarize, ...) and low-confidence matches return None so the caller can
+    route them to the LLM.
+    """
+
+    def __init__(self, reranker, threshold=config.EXTRACTIVE_CONFIDENCE_THRESHOLD, max_sentences=2):
+        self.reranker = reranker
+        self.threshold = threshold
+        self.max_sentences = max_sentences
+
+    @staticmethod
+    def split_sentences(text: str) -> List[str]:
+        text = re.sub(r"\{[^}]*\}", " ", text)
+        text = re.sub(r"^Article \d+\.\s*", "", text.strip())
+        sentences = re.split(r"(?<=[.!?])\s+", text)
+        return [s.strip() for s in sentences if len(s.strip()) >= 20]
+
+    @staticmethod
+    def is_synthesis_question(query: str) -> bool:
+        text = f" {query.lower()} "
+        return any(marker in text for marker in SYNTHESIS_MARKERS)
+
+    def answer(self, query: str, context_chunks: List[Dict], force=False) -> Optional[Dict]:
+        """
+        Returns {'answer', 'sources', 'confidence'} or None when the question
+        should go to the LLM. With force=True the best sentence is returned
+        regardless of confidence (used when the LLM is unavailable).
+        """
+        if not context_chunks or not self.reranker.enabled:
+            return None
+        if not force and self.is_synthesis_question(query):
+            return None
+
+        sources_text = [chunk.get('text', str(chunk)) for chunk in context_chunks]
+
+        article_lookup = self._find_requested_article(query, context_chunks)
+        if article_lookup is not None and ARTICLE_OVERVIEW_PATTERN.match(query):
+            sentences = self.split_sentences(sources_text[article_lookup])[:self.max_sentences]
+            if sentences:
+                return self._build_answer(
+                    [(sentence, article_lookup) for sentence in sentences], sources_text, 1.0
+                )
+
+        source_ids = [article_lookup] if article_lookup is not None else range(len(sources_text))
+        candidates = [
+            (sentence, source_idx)
+            for source_idx in source_ids
+            for sentence in self.split_sentences(sources_text[source_idx])
+        ]
+        if not candidates:
+            return None
+
+        scores = self.reranker.score(query, [sentence for sentence, _ in candidates])
+        best = max(range(len(candidates)), key=lambda i: scores[i])
+        # ReRanker.score returns raw logits, so the sigmoid is applied exactly once here.
+        confidence = 1.0 / (1.0 + math.exp(-scores[best]))
+
+        if confidence < self.threshold and not force:
+            return None
+        return self._build_answer([candidates[best]], sources_text, confidence)
+
+    @staticmethod
+    def _find_requested_article(query: str, context_chunks: List[Dict]) -> Optional[int]:
+        match = ARTICLE_PATTERN.search(query)
+        if not match:
+            return None
+        for idx, chunk in enumerate(context_chunks):
+            if chunk.get('metadata', {}).get('article_number') == match.group(1):
+                return idx
+        return None
+
+    @staticmethod
+    def _build_answer(sentences, sources_text, confidence) -> Dict:
+        answer = " ".join(f"{sentence} [{source_idx + 1}]" for sentence, source_idx in sentences)
+        return {
+            "answer": answer,
+            "sources": sources_text,
+            "confidence": round(confidence, 4)
+        }
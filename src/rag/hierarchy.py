@@ -0,0 +1,137 @@
+"""
+Hierarchical Index
+Groups chunks into articles and source documents for coarse-to-fine search
+"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+def squared_l2(query_vector, matrix):
+    """Squared L2 distances between one query vector and each row of matrix (same metric as IndexFlatL2)."""
+    diff = matrix - query_vector.reshape(1, -1)
+    return np.einsum('ij,ij->i', diff, diff)
+
+
+def pairwise_squared_l2(query_vectors, matrix):
+    """Squared L2 distances between every query row and every matrix row, shape (queries, rows)."""
+    distances = (
+        np.einsum('ij,ij->i', query_vectors, query_vectors)[:, None]
+        - 2 * query_vectors @ matrix.T
+        + np.einsum('ij,ij->i', matrix, matrix)[None, :]
+    )
+    return np.maximum(distances, 0)
+
+
+class HierarchicalIndex:
+    """
+    Two coarse tiers over the chunk embeddings: source documents and articles.
+
+    Each article group holds the ids of its child chunks and the centroid of
+    their vectors; each document holds the centroid of its articles. Routing a
+    query scores document centroids, then the article centroids inside the best
+    documents, and returns the child ids of the best articles, so the work per
+    query grows with the number of groups rather than the number of chunks.
+    """
+
+    def __init__(self, chunks: List[Dict], embeddings):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+
+        group_ids: Dict[Tuple, int] = {}
+        members: List[List[int]] = []
+        self.group_keys: List[Tuple] = []
+        for idx, chunk in enumerate(chunks):
+            key = self.group_key(chunk, idx)
+            if key not in group_ids:
+                group_ids[key] = len(self.group_keys)
+                self.group_keys.append(key)
+                members.append([])
+            members[group_ids[key]].append(idx)
+
+        self.group_members = [np.asarray(ids, dtype=np.int64) for ids in members]
+        self.chunk_group = np.empty(len(chunks), dtype=np.int64)
+        for group, ids in enumerate(self.group_members):
+            self.chunk_group[ids] = group
+        self.group_centroids = np.stack([
+            embeddings[ids].mean(axis=0) for ids in self.group_members
+        ]) if members else np.empty((0, embeddings.shape[1]), dtype=np.float32)
+
+        document_ids: Dict[str, int] = {}
+        document_groups: List[List[int]] = []
+        for group, key in enumerate(self.group_keys):
+            source = key[0]
+            if source not in document_ids:
+                document_ids[source] = len(document_groups)
+                document_groups.append([])
+            document_groups[document_ids[source]].append(group)
+
+        self.document_groups = [np.asarray(groups, dtype=np.int64) for groups in document_groups]
+        self.group_document = np.empty(self.num_groups, dtype=np.int64)
+        for document, groups in enumerate(self.document_groups):
+            self.group_document[groups] = document
+        self.document_centroids = np.stack([
+            self.group_centroids[groups].mean(axis=0) for groups in self.document_groups
+        ]) if document_groups else np.empty((0, embeddings.shape[1]), dtype=np.float32)
+
+    @staticmethod
+    def group_key(chunk, idx) -> Tuple:
+        metadata = chunk.get('metadata', {}) if isinstance(chunk, dict) else {}
+        source = metadata.get('source', '')
+        article_number = metadata.get('article_number')
+        if article_number is None:
+            return (source, 'chunk', idx)
+        return (source, 'article', str(article_number))
+
+    @property
+    def num_groups(self):
+        return len(self.group_members)
+
+    def allowed_groups(self, chunk_mask) -> np.ndarray:
+        """Boolean mask over groups that have at least one chunk allowed by chunk_mask."""
+        allowed = np.zeros(self.num_groups, dtype=bool)
+        allowed[self.chunk_group[chunk_mask]] = True
+        return allowed
+
+    def route(self, query_vector, top_groups=5, top_documents=2, chunk_mask=None) -> np.ndarray:
+        """
+        Returns the group indices of the closest articles inside the closest documents.
+        With chunk_mask, documents and articles without any allowed chunk are skipped.
+        """
+        return self.route_batch(query_vector, top_groups, top_documents, chunk_mask)[0]
+
+    def route_batch(self, query_vectors, top_groups=5, top_documents=2, chunk_mask=None) -> List[np.ndarray]:
+        """Routes a matrix of query vectors at once; entry i holds the routed groups for row i."""
+        query_vectors = np.atleast_2d(np.asarray(query_vectors, dtype=np.float32))
+        num_queries = len(query_vectors)
+        if not self.num_groups:
+            return [np.empty(0, dtype=np.int64) for _ in range(num_queries)]
+
+        group_allowed = (np.ones(self.num_groups, dtype=bool) if chunk_mask is None
+                         else self.allowed_groups(chunk_mask))
+        group_distances = pairwise_squared_l2(query_vectors, self.group_centroids)
+        group_distances[:, ~group_allowed] = np.inf
+
+        document_allowed = np.zeros(len(self.document_groups), dtype=bool)
+        document_allowed[self.group_document[group_allowed]] = True
+        if 0 < top_documents < document_allowed.sum():
+            doc_distances = pairwise_squared_l2(query_vectors, self.document_centroids)
+            doc_distances[:, ~document_allowed] = np.inf
+            best_docs = np.argpartition(doc_distances, top_documents - 1, axis=1)[:, :top_documents]
+            selected = np.zeros_like(doc_distances, dtype=bool)
+            selected[np.arange(num_queries)[:, None], best_docs] = True
+            group_distances[~selected[:, self.group_document]] = np.inf
+
+        k = min(top_groups, self.num_groups)
+        top = np.argpartition(group_distances, k - 1, axis=1)[:, :k]
+        order = np.argsort(np.take_along_axis(group_distances, top, axis=1), axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        return [
+            groups[np.isfinite(group_distances[row, groups])]
+            for row, groups in enumerate(top)
+        ]
+
+    def members(self, groups) -> np.ndarray:
+        if len(groups) == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([self.group_members[g] for g in groups])
@@ -2,6 +2,15 @@ import docx
 import os
 import json
 import re
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
+import config
+from src.rag.metadata_filter_generator import CATEGORIES, TOPICS
+from src.rag.rate_limiter import RateLimiter
+
+load_dotenv()
 
 class DocumentIngestor:
     def __init__(self, file_path):
@@ -61,12 +70,216 @@ class TextChunker:
 
         return chunks
 
+class MetadataEnricher:
+    """
+    Adds 'category' and 'topics' metadata to chunks using the LLM.
+
+    Chunks are sent in batches (many chunks per prompt), batches run concurrently
+    under a shared rate limit, and every validated result is cached by the hash of
+    the chunk text together with the model, prompt and allowed categories/topics,
+    so changing any of those re-labels every chunk. Only complete labels (a valid
+    category and 1-3 valid topics) are cached; anything else is retried on the
+    next run. The cache is a JSONL file that doubles as the checkpoint: each
+    batch's results are appended as it completes, so an interrupted run resumes
+    where it stopped and re-runs only pay for new or changed chunks.
+    """
+
+    def __init__(self, api_key=None,
+                 cache_path=config.ENRICHMENT_CACHE_PATH,
+                 batch_size=config.ENRICHMENT_BATCH_SIZE,
+                 max_workers=config.ENRICHMENT_MAX_WORKERS,
+                 requests_per_minute=config.ENRICHMENT_REQUESTS_PER_MINUTE,
+                 max_retries=3):
+        self.api_key = api_key or os.getenv("GROQ_API_KEY")
+        if not self.api_key:
+            raise ValueError("Groq API Key is required")
+        from groq import Groq
+        self.client = Groq(api_key=self.api_key)
+        self.model = "llama-3.3-70b-versatile"
+
+        self.cache_path = cache_path
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.rate_limiter = RateLimiter(requests_per_minute)
+        self.fingerprint = self._labelling_fingerprint()
+        self.cache = self._load_cache()
+
+    def _labelling_fingerprint(self):
+        # The empty-batch prompt captures the prompt template and the category/topic lists.
+        settings = json.dumps([self.model, CATEGORIES, TOPICS, self._create_batch_prompt([])])
+        return hashlib.sha256(settings.encode("utf-8")).hexdigest()
+
+    def chunk_hash(self, chunk):
+        text = chunk.get("text", "") if isinstance(chunk, dict) else str(chunk)
+        return hashlib.sha256(f"{self.fingerprint}\n{text}".encode("utf-8")).hexdigest()
+
+    def _load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+
+        with open(self.cache_path, 'rb') as f:
+            data = f.read()
+        # Drop a trailing partial line left by a crash so new entries append cleanly.
+        complete = data[:data.rfind(b'\n') + 1]
+        if len(complete) != len(data):
+            with open(self.cache_path, 'wb') as f:
+                f.write(complete)
+
+        cache = {}
+        for line in complete.decode('utf-8').splitlines():
+            try:
+                entry = json.loads(line)
+                cache[entry["key"]] = entry["metadata"]
+            except (json.JSONDecodeError, KeyError, TypeError):
+                print("Warning: Skipping unreadable enrichment cache line.")
+        return cache
+
+    def _append_cache(self, results):
+        if not self.cache_path or not results:
+            return
+        with open(self.cache_path, 'a', encoding='utf-8') as f:
+            for key, metadata in results.items():
+                f.write(json.dumps({"key": key, "metadata": metadata}, ensure_ascii=False) + "\n")
+
+    def enrich(self, chunks):
+        """Enriches chunks in place and returns them. Chunks that fail stay unenriched."""
+        keys = [self.chunk_hash(chunk) for chunk in chunks]
+        pending = {}
+        for key, chunk in zip(keys, chunks):
+            if key not in self.cache:
+                pending.setdefault(key, chunk)
+
+        print(f"Enrichment: {len(chunks) - len(pending)} chunks cached, {len(pending)} to process.")
+
+        items = list(pending.items())
+        batches = [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+
+        if batches:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [executor.submit(self._enrich_batch, batch) for batch in batches]
+                for done, future in enumerate(as_completed(futures), start=1):
+                    # Results are merged on the main thread, so the cache needs no lock.
+                    results = future.result()
+                    self.cache.update(results)
+                    self._append_cache(results)
+                    print(f"Enriched batch {done}/{len(batches)}")
+
+        for key, chunk in zip(keys, chunks):
+            extra_meta = self.cache.get(key)
+            if extra_meta and isinstance(chunk, dict):
+                chunk.setdefault("metadata", {}).update(extra_meta)
+        return chunks
+
+    def _enrich_batch(self, batch):
+        prompt = self._create_batch_prompt([chunk for _, chunk in batch])
+
+        for attempt in range(self.max_retries):
+            self.rate_limiter.acquire()
+            try:
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": "You are a legal text classifier. Return metadata for each numbered text in JSON format."
+                        },
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ],
+                    temperature=0.1,
+                    max_tokens=60 * len(batch) + 100
+                )
+                parsed = self._parse_batch_response(response.choices[0].message.content)
+                if parsed is not None:
+                    return {
+                        key: parsed[str(i + 1)]
+                        for i, (key, _) in enumerate(batch)
+                        if str(i + 1) in parsed
+                    }
+            except Exception as e:
+                print(f"Warning: Enrichment error (attempt {attempt + 1}/{self.max_retries}): {e}")
+            if attempt + 1 < self.max_retries:
+                time.sleep(2 ** attempt)
+
+        return {}
+
+    def _create_batch_prompt(self, chunks):
+        texts = "\n\n".join(
+            f"[{i + 1}] {chunk.get('text', '')[:1000]}"
+            for i, chunk in enumerate(chunks)
+        )
+
+        prompt = f"""Analyze each of the following numbered legal texts.
+
+Available categories: {", ".join(CATEGORIES)}
+Available topics: {", ".join(TOPICS)}
+
+Instructions:
+- For every text, choose exactly one category and 1-3 topics from the lists above
+- Return ONLY a JSON object (no markdown) keyed by the text number, e.g.
+  {{"1": {{"category": "Rights", "topics": ["Human Rights"]}}, "2": {{...}}}}
+
+Texts:
+{texts}
+
+JSON:"""
+
+        return prompt
+
+    def _parse_batch_response(self, response):
+        response = response.strip()
+        if response.startswith("```"):
+            lines = response.split('\n')[1:]
+            if lines and lines[-1].startswith("```"):
+                lines = lines[:-1]
+            response = '\n'.join(lines)
+
+        try:
+            data = json.loads(response)
+        except json.JSONDecodeError as e:
+            print(f"Warning: JSON parse error: {e}")
+            return None
+        if not isinstance(data, dict):
+            return None
+
+        validated = {}
+        for key, meta in data.items():
+            meta = self._validate_metadata(meta)
+            if meta:
+                validated[str(key)] = meta
+        return validated
+
+    def _validate_metadata(self, meta):
+        """Returns the label only if it has a valid category and at least one valid topic."""
+        if not isinstance(meta, dict) or meta.get("category") not in CATEGORIES:
+            return {}
+
+        topics = meta.get("topics", [])
+        if isinstance(topics, str):
+            topics = [topics]
+        if not isinstance(topics, list):
+            return {}
+
+        valid_topics = []
+        for topic in topics:
+            if topic in TOPICS and topic not in valid_topics:
+                valid_topics.append(topic)
+        if not valid_topics:
+            return {}
+
+        return {"category": meta["category"], "topics": valid_topics[:3]}
+
+
 class IngestionPipeline:
-    def __init__(self, input_path, output_path):
+    def __init__(self, input_path, output_path, enricher=None):
         self.input_path = input_path
         self.output_path = output_path
         self.ingestor = DocumentIngestor(input_path)
         self.chunker = TextChunker()
+        self.enricher = enricher
 
     def run(self):
         print(f"Loading from {self.input_path}...")
@@ -78,7 +291,15 @@ class IngestionPipeline:
         if not chunks: 
             print("Regex split failed/empty, falling back to sliding window.")
             raw_chunks = self.chunker.split_text(raw_text)
-            chunks = [{"text": c} for c in raw_chunks]
+            chunks = [{"text": c, "metadata": {"type": "window"}} for c in raw_chunks]
+
+        source = os.path.basename(self.input_path)
+        for chunk in chunks:
+            chunk["metadata"]["source"] = source
+
+        if self.enricher:
+            print("Enriching metadata...")
+            chunks = self.enricher.enrich(chunks)
 
         print(f"Saving {len(chunks)} chunks to {self.output_path}...")
         with open(self.output_path, 'w', encoding='utf-8') as f:
@@ -86,6 +307,14 @@ class IngestionPipeline:
         print("Done.")
 
 if __name__ == "__main__":
+    import argparse
     from config import DATASET_PATH, CHUNKS_FILE_PATH
-    pipeline = IngestionPipeline(DATASET_PATH, CHUNKS_FILE_PATH)
+
+    parser = argparse.ArgumentParser(description="Chunk the dataset and save it as JSON.")
+    parser.add_argument("--enrich", action="store_true",
+                        help="Add category/topic metadata with the LLM (requires GROQ_API_KEY)")
+    args = parser.parse_args()
+
+    enricher = MetadataEnricher() if args.enrich else None
+    pipeline = IngestionPipeline(DATASET_PATH, CHUNKS_FILE_PATH, enricher=enricher)
     pipeline.run()
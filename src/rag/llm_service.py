@@ -1,37 +1,48 @@
 import os
 from dotenv import load_dotenv
-from groq import Groq
 
 load_dotenv()
 
 
 class LLMService:
-    def __init__(self, api_key=None):
-        """Initialize LLM service with Groq API"""
+    def __init__(self, api_key=None, rate_limiter=None):
+        """Initialize LLM service with Groq API, optionally throttled by a shared RateLimiter"""
         self.api_key = api_key or os.getenv("GROQ_API_KEY")
         if not self.api_key:
             raise ValueError("Groq API Key is required")
+        from groq import Groq
         self.client = Groq(api_key=self.api_key)
         self.model = "llama-3.3-70b-versatile"
+        self.rate_limiter = rate_limiter
 
-    def generate_response(self, query, context_chunks):
+    def generate_response(self, query, context_chunks, extractive_answerer=None):
         """
         Synthesizes an answer based on the query and retrieved context chunks.
-        Uses LLM to generate a coherent answer from the context.
+        Uses LLM to generate a coherent answer from the context, unless the
+        extractive answerer finds a high-confidence sentence first.
         
         Args:
             query: User's question
             context_chunks: List of retrieved document chunks
+            extractive_answerer: Optional ExtractiveAnswerer tried before the LLM
             
         Returns:
-            Dictionary with 'answer' and 'sources'
+            Dictionary with 'answer', 'sources' and 'mode' ('extractive', 'llm' or 'fallback');
+            fallbacks caused by an LLM error also carry the 'error' message
         """
         if not context_chunks:
             return {
                 "answer": "I couldn't find any specific information answering that question.",
-                "sources": []
+                "sources": [],
+                "mode": "fallback"
             }
 
+        if extractive_answerer:
+            extractive = extractive_answerer.answer(query, context_chunks)
+            if extractive:
+                extractive["mode"] = "extractive"
+                return extractive
+
         # Extract text from chunks
         sources_text = [
             chunk.get('text', str(chunk)) 
@@ -48,6 +59,9 @@ class LLMService:
         prompt = self._create_prompt(query, context)
         
         try:
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+
             # Generate answer using LLM
             response = self.client.chat.completions.create(
                 model=self.model,
@@ -69,13 +83,22 @@ class LLMService:
             
             return {
                 "answer": generated_answer,
-                "sources": sources_text
+                "sources": sources_text,
+                "mode": "llm"
             }
             
         except Exception as e:
             print(f"Warning: LLM generation error: {e}")
-            # Fallback to simple extraction
-            return self._fallback_response(query, sources_text)
+            fallback = None
+            if extractive_answerer:
+                fallback = extractive_answerer.answer(query, context_chunks, force=True)
+                if fallback:
+                    fallback["mode"] = "fallback"
+            if not fallback:
+                # Fallback to simple extraction
+                fallback = self._fallback_response(query, sources_text)
+            fallback["error"] = str(e)
+            return fallback
     
     def _create_prompt(self, query, context):
         """Create a prompt for the LLM"""
@@ -105,7 +128,8 @@ Answer:"""
         if not sources_text:
             return {
                 "answer": "I couldn't find any specific information answering that question.",
-                "sources": []
+                "sources": [],
+                "mode": "fallback"
             }
         
         top_text = sources_text[0]
@@ -114,5 +138,6 @@ Answer:"""
         
         return {
             "answer": generated_answer,
-            "sources": sources_text
+            "sources": sources_text,
+            "mode": "fallback"
         }
@@ -0,0 +1,56 @@
+import threading
+
+
+class ComponentLoader:
+    """
+    Loads the retriever and re-ranker in a background thread.
+
+    The embedder, cross-encoder and FAISS index take seconds to load, so the UI
+    starts immediately and checks `state` until retrieval is ready. Each model is
+    warmed up with a dummy batch before the loader reports 'ready'.
+    """
+
+    LOADING = "loading"
+    READY = "ready"
+    FAILED = "failed"
+
+    def __init__(self):
+        self.state = self.LOADING
+        self.stage = "Starting..."
+        self.error = None
+        self.retriever = None
+        self.reranker = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._load, name="component-loader", daemon=True)
+        self._thread.start()
+
+    def _load(self):
+        try:
+            from src.rag.retriever import Retriever
+            from src.rag.reranker import ReRanker
+
+            self.stage = "Building search index..."
+            retriever = Retriever()
+            retriever.warm_up()
+
+            self.stage = "Loading re-ranker..."
+            reranker = ReRanker()
+            reranker.warm_up()
+
+            self.retriever, self.reranker = retriever, reranker
+            self.state = self.READY
+        except Exception as e:
+            print(f"Warning: Component loading failed: {e}")
+            self.error = e
+            self.state = self.FAILED
+        finally:
+            self._ready.set()
+
+    @property
+    def is_ready(self):
+        return self.state == self.READY
+
+    def wait(self, timeout=None):
+        """Blocks until loading finishes; returns True if components are ready."""
+        self._ready.wait(timeout)
+        return self.is_ready
@@ -7,7 +7,6 @@ import os
 import json
 from typing import Dict, Optional, List, Set
 from dotenv import load_dotenv
-from groq import Groq
 import config
 
 load_dotenv()
@@ -34,6 +33,7 @@ class MetadataFilterGenerator:
         self.api_key = api_key or os.getenv("GROQ_API_KEY")
         if not self.api_key:
             raise ValueError("Groq API Key is required")
+        from groq import Groq
         self.client = Groq(api_key=self.api_key)
         self.model = "llama-3.3-70b-versatile"
         
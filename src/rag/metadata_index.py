@@ -0,0 +1,76 @@
+"""
+Metadata Index
+Precomputed boolean masks over chunk ids for vectorised metadata filtering
+"""
+
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class MetadataIndex:
+    """
+    One boolean mask per category, topic and article number, built once at load
+    time. A metadata filter resolves to a single mask over all chunk ids with the
+    same semantics the per-chunk check used: case-insensitive partial match on
+    category, exact article number, and any-of on topics.
+    """
+
+    def __init__(self, chunks: List[Dict]):
+        self.size = len(chunks)
+        categories = defaultdict(list)
+        topics = defaultdict(list)
+        article_numbers = defaultdict(list)
+
+        for idx, chunk in enumerate(chunks):
+            metadata = chunk.get('metadata', {}) if isinstance(chunk, dict) else {}
+            categories[str(metadata.get('category', '')).lower()].append(idx)
+            for topic in metadata.get('topics', []) or []:
+                topics[topic].append(idx)
+            if metadata.get('article_number') is not None:
+                article_numbers[metadata['article_number']].append(idx)
+
+        self.category_masks = {key: self._mask(ids) for key, ids in categories.items()}
+        self.topic_masks = {key: self._mask(ids) for key, ids in topics.items()}
+        self.article_masks = {key: self._mask(ids) for key, ids in article_numbers.items()}
+
+    def _mask(self, ids) -> np.ndarray:
+        mask = np.zeros(self.size, dtype=bool)
+        mask[ids] = True
+        return mask
+
+    def _empty(self) -> np.ndarray:
+        return np.zeros(self.size, dtype=bool)
+
+    def mask(self, metadata_filter: Optional[Dict]) -> Optional[np.ndarray]:
+        """Returns the mask of chunks matching the filter, or None when nothing is filtered."""
+        if not metadata_filter:
+            return None
+
+        mask = np.ones(self.size, dtype=bool)
+
+        if 'category' in metadata_filter:
+            # Relaxed category filtering: allow case-insensitive partial match
+            filter_category = metadata_filter['category'].lower()
+            category_mask = self._empty()
+            for category, category_ids in self.category_masks.items():
+                if filter_category in category:
+                    category_mask |= category_ids
+            mask &= category_mask
+
+        if 'article_number' in metadata_filter:
+            mask &= self.article_masks.get(metadata_filter['article_number'], self._empty())
+
+        if 'topics' in metadata_filter:
+            filter_topics = metadata_filter['topics']
+            if isinstance(filter_topics, str):
+                filter_topics = [filter_topics]
+            if isinstance(filter_topics, list):
+                topic_mask = self._empty()
+                for topic in filter_topics:
+                    if topic in self.topic_masks:
+                        topic_mask |= self.topic_masks[topic]
+                mask &= topic_mask
+
+        return mask
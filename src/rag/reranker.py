@@ -1,15 +1,36 @@
-from sentence_transformers import CrossEncoder
 import config
 
 class ReRanker:
     def __init__(self, model_name=config.RERANKER_MODEL_NAME):
         try:
+            import torch
+            from sentence_transformers import CrossEncoder
             self.model = CrossEncoder(model_name)
+            # predict() applies Sigmoid unless the model config names an activation,
+            # so request raw logits explicitly; callers normalise them themselves.
+            self.activation_fn = torch.nn.Identity()
             self.enabled = True
         except Exception as e:
             print(f"Warning: Could not load ReRanker model ({e}). Re-ranking will be skipped.")
             self.enabled = False
 
+    def warm_up(self, batch_size=10):
+        """Scores a dummy batch so the first real rerank doesn't pay allocation costs."""
+        if self.enabled:
+            self._predict([["warm up", "warm up"]] * batch_size)
+
+    def _predict(self, pairs):
+        return self.model.predict(pairs, activation_fn=self.activation_fn)
+
+    def score(self, query, chunk_texts):
+        """Returns raw cross-encoder logits for (query, text) pairs, or None if disabled."""
+        if not self.enabled:
+            return None
+        if not chunk_texts:
+            return []
+        scores = self._predict([[query, text] for text in chunk_texts])
+        return [float(s) for s in scores]
+
     def rerank(self, query, initial_results, top_k=3):
         """
         Re-ranks a list of retrieved results using a Cross-Encoder.
@@ -22,13 +43,36 @@ class ReRanker:
             res['chunk'].get('text', str(res['chunk'])) 
             for res in initial_results
         ]
-        pairs = [[query, text] for text in chunk_texts]
-
-        scores = self.model.predict(pairs)
+        scores = self.score(query, chunk_texts)
 
         for i, res in enumerate(initial_results):
-            res['cross_score'] = float(scores[i])
+            res['cross_score'] = scores[i]
         
         initial_results.sort(key=lambda x: x['cross_score'], reverse=True)
 
         return initial_results[:top_k]
+
+    def rerank_batch(self, queries, results_lists, top_k=3):
+        """
+        Re-ranks the results of many queries with a single Cross-Encoder call.
+        results_lists[i] holds the candidates retrieved for queries[i].
+        """
+        if not self.enabled:
+            return [results[:top_k] for results in results_lists]
+
+        pairs = [
+            [query, res['chunk'].get('text', str(res['chunk']))]
+            for query, results in zip(queries, results_lists)
+            for res in results
+        ]
+        scores = self._predict(pairs) if pairs else []
+
+        ranked_lists = []
+        offset = 0
+        for results in results_lists:
+            for res in results:
+                res['cross_score'] = float(scores[offset])
+                offset += 1
+            results.sort(key=lambda x: x['cross_score'], reverse=True)
+            ranked_lists.append(results[:top_k])
+        return ranked_lists
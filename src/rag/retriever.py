@@ -1,8 +1,30 @@
 import json
-import faiss
-from sentence_transformers import SentenceTransformer
+import numpy as np
+from collections import Counter
 from typing import List, Dict, Optional
 import config
+from src.rag.hierarchy import HierarchicalIndex, squared_l2
+from src.rag.metadata_index import MetadataIndex
+
+
+class SearchResults:
+    """Chunk ids and squared L2 distances for one query; chunks are looked up only when read."""
+
+    def __init__(self, ids, scores, chunks):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.scores = np.asarray(scores, dtype=np.float32)
+        self._chunks = chunks
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        for idx, score in zip(self.ids.tolist(), self.scores.tolist()):
+            yield {"chunk": self._chunks[idx], "score": score, "id": idx}
+
+    def to_list(self) -> List[Dict]:
+        return list(self)
+
 
 class Retriever:
     def __init__(self, chunks_file=config.CHUNKS_FILE_PATH):
@@ -10,17 +32,25 @@ class Retriever:
         self.chunks = self._load_chunks()
         self.encoder = self._load_model()
         self.index = self._build_index()
+        self.hierarchy = HierarchicalIndex(self.chunks, self.embeddings)
+        self.metadata_index = MetadataIndex(self.chunks)
+        self.use_hierarchy = config.USE_HIERARCHICAL_SEARCH
 
     def _load_chunks(self):
         with open(self.chunks_file, 'r', encoding='utf-8') as f:
             return json.load(f)
 
     def _load_model(self):
+        from sentence_transformers import SentenceTransformer
         return SentenceTransformer(config.EMBEDDING_MODEL_NAME)
 
     def _build_index(self):
+        import faiss
         corpus_texts = [self._get_text(doc) for doc in self.chunks]
-        embeddings = self.encoder.encode(corpus_texts, show_progress_bar=True)
+        embeddings = np.asarray(
+            self.encoder.encode(corpus_texts, show_progress_bar=True), dtype=np.float32
+        )
+        self.embeddings = embeddings
         dimension = embeddings.shape[1]
         index = faiss.IndexFlatL2(dimension)
         index.add(embeddings)
@@ -31,58 +61,165 @@ class Retriever:
             return chunk.get("text", "")
         return str(chunk)
 
-    def _matches_filter(self, chunk: Dict, metadata_filter: Dict) -> bool:
-        if not metadata_filter:
-            return True
-        
-        chunk_metadata = chunk.get('metadata', {})
-        
-        if 'category' in metadata_filter:
-            # Relaxed category filtering: allow case-insensitive partial match
-            filter_category = metadata_filter['category'].lower()
-            chunk_category = chunk_metadata.get('category', '').lower()
-            if filter_category not in chunk_category:
-                return False
-        
-        if 'article_number' in metadata_filter:
-            if chunk_metadata.get('article_number') != metadata_filter['article_number']:
-                return False
-        
-        if 'topics' in metadata_filter:
-            filter_topics = metadata_filter['topics']
-            chunk_topics = chunk_metadata.get('topics', [])
-            
-            if isinstance(filter_topics, list):
-                if not any(topic in chunk_topics for topic in filter_topics):
-                    return False
-            elif isinstance(filter_topics, str):
-                if filter_topics not in chunk_topics:
-                    return False
-        
-        return True
-
-    def search_semantic(self, query, top_k=3, metadata_filter: Optional[Dict] = None):
-        search_k = top_k * 50 if metadata_filter else top_k
-        
-        query_vector = self.encoder.encode([query])
-        distances, indices = self.index.search(query_vector, search_k)
-        
+    def warm_up(self):
+        """Runs a dummy query so the first real search doesn't pay allocation costs."""
+        query_vector = self.encoder.encode(["warm up"])
+        self.index.search(query_vector, 1)
+
+    def encode_query(self, query):
+        return np.asarray(self.encoder.encode([query]), dtype=np.float32)
+
+    def encode_queries(self, queries: List[str], batch_size=64):
+        """Encodes many queries in one call; row i is the query vector for queries[i]."""
+        return np.asarray(self.encoder.encode(queries, batch_size=batch_size), dtype=np.float32)
+
+    def get_results(self, ids: List[int], query_vector) -> List[Dict]:
+        """Builds result dicts for known chunk ids, scored against query_vector."""
+        if not ids:
+            return []
+        ids = np.asarray(ids, dtype=np.int64)
+        distances = squared_l2(np.asarray(query_vector, dtype=np.float32).ravel(), self.embeddings[ids])
+        return SearchResults(ids, distances, self.chunks).to_list()
+
+    def search(self, query, top_k=3, metadata_filter: Optional[Dict] = None, query_vector=None):
+        if self.use_hierarchy:
+            return self.search_hierarchical(query, top_k, metadata_filter, query_vector=query_vector)
+        return self.search_semantic(query, top_k, metadata_filter, query_vector=query_vector)
+
+    def search_many(self, query_vectors, top_k=3,
+                    metadata_filter: Optional[Dict] = None) -> List[List[Dict]]:
+        """Searches a matrix of query vectors (one row per query) through the batched path."""
+        if self.use_hierarchy:
+            batch_results = self.search_hierarchical_batch(query_vectors, top_k, metadata_filter)
+        else:
+            batch_results = self.search_semantic_batch(query_vectors, top_k, metadata_filter)
+        return [results.to_list() for results in batch_results]
+
+    def search_hierarchical(self, query, top_k=3, metadata_filter: Optional[Dict] = None, query_vector=None,
+                            top_groups=config.HIERARCHY_TOP_GROUPS,
+                            top_documents=config.HIERARCHY_TOP_DOCUMENTS):
+        if query_vector is None:
+            query_vector = self.encode_query(query)
+        return self.search_hierarchical_batch(
+            query_vector, top_k, metadata_filter, top_groups, top_documents
+        )[0].to_list()
+
+    def search_hierarchical_batch(self, query_vectors, top_k=3, metadata_filter: Optional[Dict] = None,
+                                  top_groups=config.HIERARCHY_TOP_GROUPS,
+                                  top_documents=config.HIERARCHY_TOP_DOCUMENTS) -> List[SearchResults]:
+        """
+        Routes every query to the closest documents and articles first (one matrix
+        operation for the whole batch), then searches only the chunks inside each
+        query's routed articles. Metadata filters are applied while routing, so only
+        articles with matching chunks are opened. Rows whose routed articles still
+        hold too few matches fall back to the flat index in one batched call.
+        """
+        query_vectors = np.atleast_2d(np.asarray(query_vectors, dtype=np.float32))
+        mask = self.metadata_index.mask(metadata_filter)
+        routed = self.hierarchy.route_batch(
+            query_vectors, max(top_groups, top_k), top_documents, chunk_mask=mask
+        )
+        available = len(self.chunks) if mask is None else int(mask.sum())
+
         results = []
-        for i in range(search_k):
-            idx = indices[0][i]
-            dist = distances[0][i]
-            chunk = self.chunks[idx]
-            
-            if metadata_filter and not self._matches_filter(chunk, metadata_filter):
-                continue
-            
-            results.append({
-                "chunk": chunk,
-                "score": float(dist),
-                "id": int(idx)
-            })
-            
-            if len(results) >= top_k:
-                break
-        
+        fallback_rows = []
+        for row, groups in enumerate(routed):
+            routed_ids = self.hierarchy.members(groups)
+            ids = routed_ids if mask is None else routed_ids[mask[routed_ids]]
+            row_results = self._rank_subset(query_vectors[row], ids, top_k)
+            if len(row_results) < top_k and len(ids) < available:
+                fallback_rows.append(row)
+            results.append(row_results)
+
+        if fallback_rows:
+            flat_results = self.search_semantic_batch(query_vectors[fallback_rows], top_k, metadata_filter)
+            for row, row_results in zip(fallback_rows, flat_results):
+                results[row] = row_results
         return results
+
+    def get_context_chunks(self, results: List[Dict], min_hits=2) -> List[Dict]:
+        """
+        Chunks to pass to LLMService. When at least min_hits results come from the
+        same article, they are replaced by the whole parent article.
+        """
+        groups = [int(self.hierarchy.chunk_group[res['id']]) for res in results]
+        hits = Counter(groups)
+
+        context_chunks = []
+        emitted = set()
+        for res, group in zip(results, groups):
+            if hits[group] < min_hits:
+                context_chunks.append(res['chunk'])
+            elif group not in emitted:
+                emitted.add(group)
+                context_chunks.append(self._parent_chunk(group))
+        return context_chunks
+
+    def _parent_chunk(self, group) -> Dict:
+        member_ids = self.hierarchy.group_members[group]
+        first = self.chunks[member_ids[0]]
+        if len(member_ids) == 1:
+            return first
+
+        metadata = dict(first.get('metadata', {})) if isinstance(first, dict) else {}
+        metadata['type'] = 'article'
+        return {
+            "text": "\n".join(self._get_text(self.chunks[idx]) for idx in member_ids),
+            "metadata": metadata
+        }
+
+    def search_semantic(self, query, top_k=3, metadata_filter: Optional[Dict] = None, query_vector=None):
+        if query_vector is None:
+            query_vector = self.encode_query(query)
+        return self.search_semantic_batch(query_vector, top_k, metadata_filter)[0].to_list()
+
+    def search_semantic_batch(self, query_vectors, top_k=3,
+                              metadata_filter: Optional[Dict] = None) -> List[SearchResults]:
+        """
+        Exact search for a matrix of query vectors (one row per query).
+
+        FAISS's -1 padding (when search_k exceeds the corpus) and filtered-out ids
+        are dropped with NumPy masks instead of a per-candidate loop. If the
+        over-fetched window holds fewer than top_k filter matches, the matching
+        chunks are ranked directly so filtered searches never come back short.
+        """
+        query_vectors = np.atleast_2d(np.asarray(query_vectors, dtype=np.float32))
+        mask = self.metadata_index.mask(metadata_filter)
+        allowed = None
+
+        if mask is not None:
+            allowed = np.flatnonzero(mask)
+            if len(allowed) <= top_k * 50:
+                return [self._rank_subset(query_vector, allowed, top_k) for query_vector in query_vectors]
+            search_k = top_k * 50
+        else:
+            search_k = top_k
+
+        search_k = min(search_k, self.index.ntotal)
+        if search_k <= 0:
+            return [SearchResults([], [], self.chunks) for _ in query_vectors]
+
+        distances, indices = self.index.search(query_vectors, search_k)
+        valid = indices >= 0
+        if mask is not None:
+            valid &= mask[np.where(valid, indices, 0)]
+
+        results = []
+        for row, query_vector in enumerate(query_vectors):
+            row_valid = valid[row]
+            ids = indices[row][row_valid][:top_k]
+            if allowed is not None and len(ids) < top_k:
+                results.append(self._rank_subset(query_vector, allowed, top_k))
+            else:
+                results.append(SearchResults(ids, distances[row][row_valid][:top_k], self.chunks))
+        return results
+
+    def _rank_subset(self, query_vector, ids, top_k) -> SearchResults:
+        """Exact top_k over an explicit set of chunk ids."""
+        distances = squared_l2(query_vector, self.embeddings[ids])
+        if len(ids) > top_k:
+            order = np.argpartition(distances, top_k)[:top_k]
+            order = order[np.argsort(distances[order], kind='stable')]
+        else:
+            order = np.argsort(distances, kind='stable')
+        return SearchResults(ids[order], distances[order], self.chunks)
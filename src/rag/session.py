@@ -0,0 +1,227 @@
+"""
+Conversation Sessions
+Reuses retrieval state across chat turns so follow-up questions stay on topic
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+
+FOLLOW_UP_PREFIXES = (
+    "and ", "but ", "also ", "what about", "how about", "what if", "then ", "so ",
+)
+
+FOLLOW_UP_WORDS = {
+    "it", "its", "these", "those", "they", "them", "their",
+    "he", "she", "his", "her", "previous",
+}
+
+
+class ConversationSession:
+    def __init__(self, max_turns=5, max_cached_scores=500):
+        self.turns = deque(maxlen=max_turns)
+        self.rerank_scores = OrderedDict()
+        self.max_cached_scores = max_cached_scores
+        self.last_active = time.monotonic()
+
+    @property
+    def last_turn(self) -> Optional[Dict]:
+        return self.turns[-1] if self.turns else None
+
+    def get_score(self, topic_query: str, chunk_id: int) -> Optional[float]:
+        return self.rerank_scores.get((topic_query, chunk_id))
+
+    def set_score(self, topic_query: str, chunk_id: int, score: float):
+        self.rerank_scores[(topic_query, chunk_id)] = score
+        while len(self.rerank_scores) > self.max_cached_scores:
+            self.rerank_scores.popitem(last=False)
+
+
+class SessionManager:
+    """
+    Keeps per-conversation retrieval state: the last few query vectors, candidate
+    ids and cross-encoder scores.
+
+    A turn is a follow-up when it has a follow-up cue (a leading "and", "what
+    about", a pronoun) and its own vector is close enough to the previous turn's.
+    Follow-ups are expanded without an LLM call by blending their vector with the
+    previous turn's, and the previous top chunks are added to the new candidates
+    as a warm start. When a turn's vector is nearly identical to the last one and
+    it names the same identifiers (article numbers, quoted terms), the previous
+    candidates are reused and no search runs at all. Cross-encoder scores are
+    cached per topic (the query that started the thread) and chunk, so a chunk
+    is scored once per thread and follow-ups only score newly retrieved chunks.
+    Sessions are evicted least-recently-used beyond `max_sessions` and after
+    `ttl_seconds` of inactivity.
+    """
+
+    def __init__(self, retriever, reranker, max_sessions=100, ttl_seconds=3600,
+                 max_turns=5, follow_up_weight=0.6, follow_up_similarity=0.35,
+                 reuse_similarity=0.95):
+        self.retriever = retriever
+        self.reranker = reranker
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_turns = max_turns
+        self.follow_up_weight = follow_up_weight
+        self.follow_up_similarity = follow_up_similarity
+        self.reuse_similarity = reuse_similarity
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_session(self, session_id: str) -> ConversationSession:
+        now = time.monotonic()
+        with self._lock:
+            expired = [
+                sid for sid, session in self._sessions.items()
+                if now - session.last_active > self.ttl_seconds
+            ]
+            for sid in expired:
+                del self._sessions[sid]
+
+            session = self._sessions.pop(session_id, None)
+            if session is None:
+                session = ConversationSession(max_turns=self.max_turns)
+            session.last_active = now
+            self._sessions[session_id] = session
+
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return session
+
+    def clear_session(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    @staticmethod
+    def has_follow_up_cue(query: str) -> bool:
+        text = query.strip().lower()
+        if text.startswith(FOLLOW_UP_PREFIXES):
+            return True
+        words = re.findall(r"[a-z']+", text)
+        return any(word in FOLLOW_UP_WORDS for word in words)
+
+    @staticmethod
+    def _normalize(vector):
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    @staticmethod
+    def identifiers(query: str) -> Set[str]:
+        """Numbers and quoted terms in the query; turns that differ in these never reuse results."""
+        numbers = re.findall(r"\d+", query)
+        quoted = re.findall(r"[\"“']([^\"”']+)[\"”']", query)
+        return set(numbers) | {term.strip().lower() for term in quoted}
+
+    @classmethod
+    def _cosine(cls, a, b) -> float:
+        return float(np.dot(cls._normalize(a).ravel(), cls._normalize(b).ravel()))
+
+    def search(self, session_id: str, query: str, top_k=10,
+               metadata_filter: Optional[Dict] = None) -> Dict:
+        """
+        Retrieves candidates for a chat turn.
+
+        Returns a dict with 'results', the 'rerank_query' to score them against,
+        the 'topic_query' its scores are cached under, the 'follow_up' / 'reused'
+        flags describing how the turn was handled, and the recorded 'turn' (None
+        when nothing was found). Pass it to rerank() unchanged.
+        """
+        session = self.get_session(session_id)
+        previous = session.last_turn
+
+        raw_vector = self.retriever.encode_query(query)
+        query_vector = raw_vector
+        topic_query = query
+        rerank_query = query
+
+        # Similarity is always measured on unblended vectors, so blending can't inflate it.
+        similarity = self._cosine(raw_vector, previous["raw_vector"]) if previous is not None else 0.0
+        follow_up = (
+            previous is not None
+            and similarity >= self.follow_up_similarity
+            and self.has_follow_up_cue(query)
+        )
+
+        if follow_up:
+            blended = (self.follow_up_weight * self._normalize(query_vector)
+                       + (1 - self.follow_up_weight) * self._normalize(previous["vector"]))
+            query_vector = self._normalize(blended).astype(np.float32)
+            topic_query = previous["topic_query"]
+            rerank_query = f"{topic_query} {query}"
+
+        reused = (
+            previous is not None
+            and previous["filter"] == metadata_filter
+            and similarity >= self.reuse_similarity
+            and self.identifiers(query) == self.identifiers(previous["query"])
+        )
+
+        if reused:
+            # Stay in the previous thread so its cached cross-encoder scores apply.
+            topic_query = previous["topic_query"]
+            results = self.retriever.get_results(previous["candidate_ids"], query_vector)
+        else:
+            results = self.retriever.search(
+                query, top_k=top_k, metadata_filter=metadata_filter, query_vector=query_vector
+            )
+            if follow_up and results:
+                seen = {res["id"] for res in results}
+                warm_ids = [idx for idx in previous["ranked_ids"] if idx not in seen]
+                results.extend(self.retriever.get_results(warm_ids, query_vector))
+
+        turn = None
+        if results:
+            turn = {
+                "query": query,
+                "topic_query": topic_query,
+                "rerank_query": rerank_query,
+                "raw_vector": raw_vector,
+                "vector": query_vector,
+                "filter": metadata_filter,
+                "candidate_ids": [res["id"] for res in results],
+                "ranked_ids": [],
+            }
+            session.turns.append(turn)
+
+        return {
+            "results": results,
+            "rerank_query": rerank_query,
+            "topic_query": topic_query,
+            "follow_up": follow_up,
+            "reused": reused,
+            "turn": turn,
+        }
+
+    def rerank(self, session_id: str, search: Dict, top_k=3) -> List[Dict]:
+        """
+        Re-ranks the results of search(), scoring only chunks that haven't been
+        scored yet in this topic thread.
+        """
+        session = self.get_session(session_id)
+        results = search["results"]
+        topic_query = search["topic_query"]
+
+        if self.reranker.enabled and results:
+            scores = {res["id"]: session.get_score(topic_query, res["id"]) for res in results}
+            missing = [res for res in results if scores[res["id"]] is None]
+            new_scores = self.reranker.score(
+                search["rerank_query"],
+                [res["chunk"].get("text", str(res["chunk"])) for res in missing]
+            )
+            for res, score in zip(missing, new_scores):
+                scores[res["id"]] = score
+                session.set_score(topic_query, res["id"], score)
+
+            for res in results:
+                res["cross_score"] = scores[res["id"]]
+            results.sort(key=lambda x: x["cross_score"], reverse=True)
+
+        ranked = results[:top_k]
+        if search["turn"] is not None:
+            search["turn"]["ranked_ids"] = [res["id"] for res in ranked]
+        return ranked
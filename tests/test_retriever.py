@@ -0,0 +1,139 @@
+import itertools
+import json
+import os
+
+import faiss
+import numpy as np
+import pytest
+
+from src.rag.hierarchy import HierarchicalIndex
+from src.rag.metadata_index import MetadataIndex
+from src.rag.retriever import Retriever
+
+CHUNKS_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "chunks_with_metadata.json")
+
+
+def matches_filter(chunk, metadata_filter):
+    """The per-chunk check the retriever used before MetadataIndex, kept as the reference."""
+    if not metadata_filter:
+        return True
+
+    chunk_metadata = chunk.get('metadata', {})
+
+    if 'category' in metadata_filter:
+        filter_category = metadata_filter['category'].lower()
+        chunk_category = chunk_metadata.get('category', '').lower()
+        if filter_category not in chunk_category:
+            return False
+
+    if 'article_number' in metadata_filter:
+        if chunk_metadata.get('article_number') != metadata_filter['article_number']:
+            return False
+
+    if 'topics' in metadata_filter:
+        filter_topics = metadata_filter['topics']
+        chunk_topics = chunk_metadata.get('topics', [])
+
+        if isinstance(filter_topics, list):
+            if not any(topic in chunk_topics for topic in filter_topics):
+                return False
+        elif isinstance(filter_topics, str):
+            if filter_topics not in chunk_topics:
+                return False
+
+    return True
+
+
+@pytest.fixture(scope="module")
+def chunks():
+    with open(CHUNKS_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def build_retriever(chunks, dimension=16, seed=0):
+    """A Retriever over random embeddings, skipping the sentence-transformers model."""
+    embeddings = np.random.default_rng(seed).standard_normal((len(chunks), dimension)).astype(np.float32)
+    retriever = Retriever.__new__(Retriever)
+    retriever.chunks = chunks
+    retriever.encoder = None
+    retriever.embeddings = embeddings
+    retriever.index = faiss.IndexFlatL2(dimension)
+    retriever.index.add(embeddings)
+    retriever.hierarchy = HierarchicalIndex(chunks, embeddings)
+    retriever.metadata_index = MetadataIndex(chunks)
+    retriever.use_hierarchy = False
+    return retriever
+
+
+def filters_for(chunks):
+    categories = sorted({c['metadata'].get('category', '') for c in chunks})
+    topics = sorted({t for c in chunks for t in c['metadata'].get('topics', [])})
+    articles = sorted({c['metadata'].get('article_number') for c in chunks} - {None})
+
+    category_filters = [{}] + [{'category': c} for c in categories] + [
+        {'category': categories[0][:3].lower()}, {'category': 'GOV'}, {'category': 'missing'}
+    ]
+    topic_filters = [{}, {'topics': topics[0]}, {'topics': topics[:3]},
+                     {'topics': ['missing']}, {'topics': []}]
+    article_filters = [{}, {'article_number': articles[0]}, {'article_number': articles[-1]},
+                       {'article_number': 'missing'}]
+
+    for parts in itertools.product(category_filters, topic_filters, article_filters):
+        yield {key: value for part in parts for key, value in part.items()}
+
+
+def test_mask_matches_per_chunk_filter(chunks):
+    index = MetadataIndex(chunks)
+    for metadata_filter in filters_for(chunks):
+        expected = np.array([matches_filter(chunk, metadata_filter) for chunk in chunks])
+        mask = index.mask(metadata_filter)
+        if mask is None:
+            assert expected.all(), metadata_filter
+        else:
+            np.testing.assert_array_equal(mask, expected, err_msg=str(metadata_filter))
+
+
+def test_top_k_above_corpus_size_drops_padding(chunks):
+    retriever = build_retriever(chunks)
+    query_vectors = np.random.default_rng(1).standard_normal((3, 16)).astype(np.float32)
+
+    for results in retriever.search_semantic_batch(query_vectors, top_k=len(chunks) + 50):
+        assert len(results) == len(chunks)
+        assert (results.ids >= 0).all()
+        assert len(set(results.ids.tolist())) == len(chunks)
+        assert (np.diff(results.scores) >= 0).all()
+
+
+def test_filtered_search_falls_back_when_window_is_short(chunks):
+    retriever = build_retriever(chunks)
+    metadata_filter = {'category': 'Rights'}
+    allowed = np.flatnonzero([matches_filter(chunk, metadata_filter) for chunk in chunks])
+    query_vector = retriever.embeddings[allowed[0]]
+
+    # top_k * 50 covers every allowed chunk, so the subset is ranked directly;
+    # with top_k above the match count the result is every match, exactly once.
+    results = retriever.search_semantic_batch(query_vector, top_k=len(allowed) + 5,
+                                              metadata_filter=metadata_filter)[0]
+    assert sorted(results.ids.tolist()) == allowed.tolist()
+    assert results.ids[0] == allowed[0]
+
+    # With top_k=1 the 55 matches exceed the 50-candidate window, so FAISS is
+    # searched; an index holding only non-matching chunks leaves the window
+    # empty and the short-window fallback must still return the exact best match.
+    assert len(allowed) > 50
+    others = np.setdiff1d(np.arange(len(chunks)), allowed)
+    retriever.index = faiss.IndexIDMap(faiss.IndexFlatL2(retriever.embeddings.shape[1]))
+    retriever.index.add_with_ids(retriever.embeddings[others], others.astype(np.int64))
+    results = retriever.search_semantic_batch(query_vector, top_k=1, metadata_filter=metadata_filter)[0]
+    assert results.ids.tolist() == [allowed[0]]
+
+
+def test_hierarchical_batch_matches_flat_for_full_routing(chunks):
+    retriever = build_retriever(chunks)
+    query_vectors = np.random.default_rng(2).standard_normal((4, 16)).astype(np.float32)
+    flat = retriever.search_semantic_batch(query_vectors, top_k=5)
+    routed = retriever.search_hierarchical_batch(
+        query_vectors, top_k=5, top_groups=retriever.hierarchy.num_groups, top_documents=0
+    )
+    for flat_results, routed_results in zip(flat, routed):
+        assert routed_results.ids.tolist() == flat_results.ids.tolist()